@@ -1,17 +1,25 @@
 import boto3
+import functools
+import io
 import os
 import sys
 import netCDF4 as nc
-import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.ticker as ticker
 import matplotlib.colors as colors
 import numpy as np
-from datetime import datetime
+from datetime import datetime, timedelta
 import time
 import logging
+import threading
 import warnings
+from concurrent.futures import ThreadPoolExecutor
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from matplotlib.dates import DateFormatter
+from matplotlib.figure import Figure
+from PIL import Image
 
 import matplotlib
 matplotlib.use('Agg')
@@ -29,10 +37,49 @@ logger = logging.getLogger(__name__)
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
-def upload_to_s3(local_file, bucket_name, s3_path):
+# Sites are processed concurrently, each an independent download/plot/upload
+MAX_SITE_WORKERS = 16
+
+# Height axes: metres on the primary axis, feet on the secondary one
+M_TO_FT = 3.28084
+MAX_HEIGHT_M = 6000.0
+YLIM_FT = (0.0, MAX_HEIGHT_M * M_TO_FT)
+# Locators attach to a single axis, so only the spacing is shared
+FT_TICK_SPACING = 500.0 * M_TO_FT
+
+# Each worker thread keeps one Figure per plot type and clears it between sites
+_FIG_CACHE = threading.local()
+
+# Shared by every worker: multi-MB .nc files are fetched as concurrent 16 MB byte ranges
+DOWNLOAD_CONCURRENCY = 8
+DOWNLOAD_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=DOWNLOAD_CONCURRENCY,
+    io_chunksize=256 * 1024,
+    use_threads=True
+)
+
+# One S3 client shared by every thread (clients are thread-safe; sessions are not). Building a
+# client loads the botocore service model, so it is created once, with a connection pool large
+# enough for every site worker to run a full-concurrency download at the same time
+s3 = boto3.client('s3', config=Config(max_pool_connections=MAX_SITE_WORKERS * DOWNLOAD_CONCURRENCY))
+
+# Per-site state kept between runs (e.g. the dated subfolder naming stem)
+CACHE_DIR = '/var/cache/cl31'
+
+def list_s3_pages(s3_client, bucket_name, prefix, delimiter=None):
+    """Iterate over every list_objects_v2 page under a prefix (single calls stop at 1000 keys)"""
+    paginator = s3_client.get_paginator('list_objects_v2')
+    kwargs = {'Bucket': bucket_name, 'Prefix': prefix, 'PaginationConfig': {'PageSize': 1000}}
+    if delimiter is not None:
+        kwargs['Delimiter'] = delimiter
+    return paginator.paginate(**kwargs)
+
+def upload_to_s3(local_file, bucket_name, s3_path, s3_client=None):
     """Upload a file to S3"""
     try:
-        s3_client = boto3.client('s3')
+        s3_client = s3_client or s3
         s3_client.upload_file(
             local_file, 
             bucket_name, 
@@ -44,18 +91,40 @@ def upload_to_s3(local_file, bucket_name, s3_path):
         logger.error(f"Error uploading to S3: {e}")
         raise
 
+def copy_within_s3(bucket_name, source_path, s3_path, s3_client=None):
+    """Copy an object to another key in the same bucket (server-side, no re-upload)"""
+    try:
+        s3_client = s3_client or s3
+        s3_client.copy_object(
+            Bucket=bucket_name,
+            Key=s3_path,
+            CopySource={'Bucket': bucket_name, 'Key': source_path},
+            ContentType='image/png',
+            MetadataDirective='REPLACE'
+        )
+        logger.info(f"Successfully copied s3://{bucket_name}/{source_path} to s3://{bucket_name}/{s3_path}")
+    except Exception as e:
+        logger.error(f"Error copying within S3: {e}")
+        raise
+
+def publish_plot(local_plot_path, bucket_name, dated_plot_path, recent_plot_path, s3_client=None):
+    """Upload a plot to its dated key, copy it to the recent/ key, then delete the local file"""
+    upload_to_s3(local_plot_path, bucket_name, dated_plot_path, s3_client)
+    copy_within_s3(bucket_name, dated_plot_path, recent_plot_path, s3_client)
+    os.remove(local_plot_path)
+
 def get_latest_file():
     """Get the latest .nc file from S3"""
-    s3_client = boto3.client('s3')
     bucket_name = 'in-situ-592as8'
     prefix = 'CL31/'
 
     folders = []
-    response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix, Delimiter='/')
+    common_prefixes = [p for page in list_s3_pages(s3, bucket_name, prefix, delimiter='/')
+                       for p in page.get('CommonPrefixes', [])]
     
-    logger.info("Found folders: %s", [p.get('Prefix') for p in response.get('CommonPrefixes', [])])
+    logger.info("Found folders: %s", [p.get('Prefix') for p in common_prefixes])
     
-    for prefix in response.get('CommonPrefixes', []):
+    for prefix in common_prefixes:
         folder_name = prefix.get('Prefix')
         if 'CL31_45' in folder_name:
             date_str = folder_name[-9:-1]
@@ -68,11 +137,12 @@ def get_latest_file():
     logger.info(f"Latest folder: {latest_folder}")
 
     files = []
-    response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=latest_folder)
+    contents = [obj for page in list_s3_pages(s3, bucket_name, latest_folder)
+                for obj in page.get('Contents', [])]
     
-    logger.info("Files in latest folder: %s", [obj['Key'] for obj in response.get('Contents', [])])
+    logger.info("Files in latest folder: %s", [obj['Key'] for obj in contents])
     
-    for obj in response.get('Contents', []):
+    for obj in contents:
         if obj['Key'].endswith('.nc'):
             filename = obj['Key']
             try:
@@ -91,17 +161,88 @@ def get_latest_file():
     
     local_file = os.path.basename(latest_file)
     logger.info(f"Downloading {latest_file} to {local_file}")
-    s3_client.download_file(bucket_name, latest_file, local_file)
+    s3.download_file(bucket_name, latest_file, local_file, Config=DOWNLOAD_CONFIG)
     logger.info("Download complete!")
     return local_file, latest_file, bucket_name
 
-def plot_cbh_vs_time(df, save_image_path, lat, lon, site_name):
-    fig, ax1 = plt.subplots(figsize=(10, 6))
+def read_variable(dataset, name, index=slice(None)):
+    """Read a netCDF variable as a plain NumPy array, with missing values replaced by NaN.
+
+    The dataset is expected to have auto-masking and auto-scaling disabled, so this skips
+    the MaskedArray construction netCDF4 would otherwise do on every read. As in netCDF4,
+    missing values (_FillValue, missing_value, the default fill value and anything outside
+    valid_range/valid_min/valid_max) are found on the packed values before unpacking.
+    """
+    variable = dataset.variables[name]
+    data = np.asarray(variable[index])
+    attrs = set(variable.ncattrs())
+
+    masks = []
+    for attr in ('_FillValue', 'missing_value'):
+        if attr in attrs:
+            masks.append(np.isin(data, np.atleast_1d(variable.getncattr(attr))))
+    # netCDF4 masks the default fill value when none is set, except for byte types
+    if '_FillValue' not in attrs and data.dtype.kind in 'iuf' and data.dtype.itemsize > 1:
+        masks.append(data == nc.default_fillvals[data.dtype.str[1:]])
+    if 'valid_range' in attrs:
+        valid_min, valid_max = variable.getncattr('valid_range')
+    else:
+        valid_min = variable.getncattr('valid_min') if 'valid_min' in attrs else None
+        valid_max = variable.getncattr('valid_max') if 'valid_max' in attrs else None
+    if valid_min is not None:
+        masks.append(data < valid_min)
+    if valid_max is not None:
+        masks.append(data > valid_max)
+
+    scale_factor = variable.getncattr('scale_factor') if 'scale_factor' in attrs else None
+    add_offset = variable.getncattr('add_offset') if 'add_offset' in attrs else None
+    missing = np.logical_or.reduce(masks) if masks else None
+    has_missing = missing is not None and missing.any()
+
+    if data.dtype.kind != 'f' and (has_missing or scale_factor is not None or add_offset is not None):
+        data = data.astype(np.float64)
+    if scale_factor is not None:
+        data = data * scale_factor
+    if add_offset is not None:
+        data = data + add_offset
+    if has_missing:
+        data[missing] = np.nan
+    return data
+
+def epoch_seconds_to_datetime64(seconds):
+    """Convert seconds since the Unix epoch to datetime64[ns] with one vectorized cast"""
+    return (np.asarray(seconds, dtype=np.float64) * 1e9).astype(np.int64).astype('datetime64[ns]')
+
+def get_cached_figure(name, figsize):
+    """Return this thread's reusable Figure for a plot type, cleared and resized"""
+    fig = getattr(_FIG_CACHE, name, None)
+    if fig is None:
+        fig = Figure(figsize=figsize)
+        setattr(_FIG_CACHE, name, fig)
+    fig.clf()
+    fig.set_size_inches(figsize)
+    return fig
+
+def save_paletted_png(fig, save_image_path, dpi):
+    """Save a figure as an optimized 256-colour palette PNG instead of matplotlib's truecolor RGBA"""
+    # The intermediate render is decoded straight away, so encode it as cheaply as possible
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, pil_kwargs={'compress_level': 1})
+    buffer.seek(0)
+    with Image.open(buffer) as image:
+        paletted = image.convert('RGB').quantize(colors=256)
+    paletted.save(save_image_path, format='PNG', optimize=True)
+
+def plot_cbh_vs_time(time_datetime, cbh, save_image_path, lat, lon, site_name, dpi=120):
+    """Plot the 1st/2nd/3rd cloud base heights; cbh holds the three cbh_N arrays in order"""
+    fig = get_cached_figure('cbh_fig', (10, 6))
+    ax1 = fig.add_subplot(111)
     
-    ax1.scatter(df['time'], df['cbh_1'], label='1st Cloud Base', color='black', marker='x')
-    ax1.scatter(df['time'], df['cbh_2'], label='2nd Cloud Base', color='blue', marker='x')
-    ax1.scatter(df['time'], df['cbh_3'], label='3rd Cloud Base', color='red', marker='x')
-    ax1.set_ylim(0, 6000)
+    # Marker-only Line2D artists are much cheaper to build and draw than scatter's PathCollection
+    ax1.plot(time_datetime, cbh[0], linestyle='None', marker='x', label='1st Cloud Base', color='black')
+    ax1.plot(time_datetime, cbh[1], linestyle='None', marker='x', label='2nd Cloud Base', color='blue')
+    ax1.plot(time_datetime, cbh[2], linestyle='None', marker='x', label='3rd Cloud Base', color='red')
+    ax1.set_ylim(0, MAX_HEIGHT_M)
 
 
     ax1.set_ylabel('Cloud Base Height (m - AGL)')
@@ -118,31 +259,29 @@ def plot_cbh_vs_time(df, save_image_path, lat, lon, site_name):
     ax2.spines["left"].set_position(("axes", -0.15))
     ax2.yaxis.set_label_position("left")
     ax2.yaxis.set_ticks_position("left")
-    
-    def meters_to_feet(meters):
-        return meters * 3.28084
 
-    ax2.set_ylim(meters_to_feet(0), meters_to_feet(6000))
+    ax2.set_ylim(*YLIM_FT)
     ax2.set_ylabel('Cloud Base Height (feet - AGL)')
-    ax2.yaxis.set_major_locator(ticker.MultipleLocator(500 * 3.28084))
+    ax2.yaxis.set_major_locator(ticker.MultipleLocator(FT_TICK_SPACING))
 
-    plt.title(f'Cloud Base Heights vs. Time (Lat: {lat}, Lon: {lon}), {site_name}')
-    plt.tight_layout()
-    plt.savefig(save_image_path, dpi=300)
-    plt.close('all')
+    ax2.set_title(f'Cloud Base Heights vs. Time (Lat: {lat}, Lon: {lon}), {site_name}')
+    fig.tight_layout()
+    fig.savefig(save_image_path, dpi=dpi)
+    fig.clear()
     logger.info(f"CBH plot saved to {save_image_path}")
 
-def plot_diagnostics_subplots(df, save_image_path, lat, lon, site_name):
-    diagnostics_vars = ['laser_temperature', 'pulse_energy', 'backscatter_sum']
+def plot_diagnostics_subplots(time_datetime, diagnostics, save_image_path, lat, lon, site_name):
+    """Plot each diagnostic series; diagnostics maps variable name to its array, in plot order"""
+    diagnostics_vars = list(diagnostics)
     num_vars = len(diagnostics_vars)
     num_cols = 3
     num_rows = (num_vars + num_cols - 1) // num_cols
     
-    fig, axes = plt.subplots(num_rows, num_cols, figsize=(15, 10))
-    axes = axes.flatten()
+    fig = get_cached_figure('diagnostics_fig', (15, 10))
+    axes = fig.subplots(num_rows, num_cols).flatten()
 
     for i, var in enumerate(diagnostics_vars):
-        axes[i].plot(df['time'], df[var], label=var, color='black')
+        axes[i].plot(time_datetime, diagnostics[var], label=var, color='black')
         axes[i].set_title(var.replace('_', ' ').title())
         axes[i].set_xlabel('Time (UTC)')
         axes[i].set_ylabel(var.replace('_', ' ').title())
@@ -151,25 +290,36 @@ def plot_diagnostics_subplots(df, save_image_path, lat, lon, site_name):
     for j in range(i + 1, len(axes)):
         fig.delaxes(axes[j])
 
-    plt.title(f'Diagnostic Plots (Lat: {lat}, Lon: {lon}), {site_name}')
-    plt.tight_layout()
-    plt.savefig(save_image_path)
-    plt.close('all')
+    fig.suptitle(f'Diagnostic Plots (Lat: {lat}, Lon: {lon}), {site_name}')
+    fig.tight_layout()
+    fig.savefig(save_image_path)
+    fig.clear()
     logger.info(f"Diagnostics subplot figure saved to {save_image_path}")
 
-def plot_backscatter_contour_log(dataset, save_image_path, lat, lon, site_name, vmin=1e-9, vmax=1e-1, num_bins=50):
-    time = dataset.variables['time'][:]
-    levels = dataset.variables['level'][:] * 10
-    backscatter = dataset.variables['backscatter'][:, :]
-
-    time_datetime = pd.to_datetime(time, unit='s')
-    levels_bins = np.logspace(np.log10(vmin), np.log10(vmax), num_bins)
-
-    fig, ax1 = plt.subplots(figsize=(12, 6))
+def plot_backscatter_contour_log(time_datetime, levels, backscatter, save_image_path, lat, lon, site_name, vmin=1e-9, vmax=1e-1,
+                                 num_bins=50, max_height=MAX_HEIGHT_M, fig_width_in=12, dpi=120):
+    """Plot a (time, level) backscatter array on a log colour scale; levels are heights in metres"""
+    # Block-average along time down to ~2 samples per output pixel; finer detail is never rendered.
+    # Missing (NaN) samples are left out of each block's mean, and each block is placed at its middle
+    # timestamp since pcolormesh centres cells on their coordinates
+    stride = max(1, backscatter.shape[0] // int(fig_width_in * dpi * 2))
+    if stride > 1:
+        num_blocks = backscatter.shape[0] // stride
+        with warnings.catch_warnings():
+            # Blocks with no valid samples at a height stay NaN
+            warnings.simplefilter('ignore', category=RuntimeWarning)
+            backscatter = np.nanmean(backscatter[:num_blocks * stride].reshape(num_blocks, stride, -1), axis=1)
+        time_datetime = time_datetime[stride // 2:num_blocks * stride:stride]
+
+    # A colormap with num_bins colors over the log norm keeps the banded look of the old 50-level contourf
+    cmap = plt.get_cmap('gist_ncar_r', num_bins)
+
+    fig = get_cached_figure('backscatter_fig', (fig_width_in, 6))
+    ax1 = fig.add_subplot(111)
     
-    contour = ax1.contourf(time_datetime, levels, np.transpose(backscatter), 
-                           cmap='gist_ncar_r', norm=colors.LogNorm(vmin=vmin, vmax=vmax), levels=levels_bins)
-    cbar = plt.colorbar(contour)
+    mesh = ax1.pcolormesh(time_datetime, levels, np.transpose(backscatter), shading='auto',
+                          cmap=cmap, norm=colors.LogNorm(vmin=vmin, vmax=vmax), rasterized=True)
+    cbar = fig.colorbar(mesh, ax=ax1)
     
     cbar.set_ticks([1e-9, 1e-8, 1e-7, 1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1])
     cbar.set_ticklabels(['1e-9', '1e-8', '1e-7', '1e-6', '1e-5', '1e-4', '1e-3', '1e-2', '1e-1'])
@@ -178,7 +328,7 @@ def plot_backscatter_contour_log(dataset, save_image_path, lat, lon, site_name,
 
     ax1.set_xlabel('Time (UTC)')
     ax1.set_ylabel('Height (m - AGL)')
-    ax1.set_ylim(0, 6000)
+    ax1.set_ylim(0, max_height)
     
 
     ax1.set_xlabel('Time (UTC - M HR:MIN)')
@@ -195,57 +345,25 @@ def plot_backscatter_contour_log(dataset, save_image_path, lat, lon, site_name,
     ax2.yaxis.set_label_position("left")
     ax2.yaxis.set_ticks_position("left")
 
-    def meters_to_feet(meters):
-        return meters * 3.28084
-
-    ax2.set_ylim(meters_to_feet(0), meters_to_feet(6000))
+    ax2.set_ylim(0.0, max_height * M_TO_FT)
     ax2.set_ylabel('Height (feet - AGL)')
 
-    plt.title(f'Backscatter Contour Plot (Lat: {lat}, Lon: {lon}), {site_name}')
-    plt.tight_layout()
-    plt.savefig(save_image_path)
-    plt.close('all')
+    ax2.set_title(f'Backscatter Contour Plot (Lat: {lat}, Lon: {lon}), {site_name}')
+    fig.tight_layout()
+    save_paletted_png(fig, save_image_path, dpi)
+    fig.clear()
     logger.info(f"Backscatter contour plot (log scale) saved to {save_image_path}")
 
-def process_cl31_child(child_prefix, bucket_name='in-situ-592as8'):
-    """Process a single CL31 child directory"""
-    try:
-        s3_client = boto3.client('s3')
-        logger.info(f"Processing CL31 child directory: {child_prefix}")
-
-        # Ensure 'recent' folder exists directly under the site directory
-        site_path = child_prefix.rstrip('/')  # e.g., 'CL31/Lexington'
-        recent_folder = f"{site_path}/recent/"
-        
-        try:
-            s3_client.head_object(Bucket=bucket_name, Key=recent_folder)
-        except:
-            s3_client.put_object(Bucket=bucket_name, Key=recent_folder)
-            logger.info(f"Created recent folder: {recent_folder}")
-
-        # Get all subfolders within this child
-        subfolders = []
-        response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=child_prefix, Delimiter='/')
-        
-        for prefix in response.get('CommonPrefixes', []):
-            subfolder = prefix.get('Prefix')
-            if subfolder[-9:-1].isdigit() and len(subfolder[-9:-1]) == 8:
-                date_str = subfolder[-9:-1]
-                subfolders.append((subfolder, date_str))
-        
-        if not subfolders:
-            logger.warning(f"No valid date-formatted subfolders found in {child_prefix}")
-            return
-            
-        # Get the latest subfolder
-        latest_subfolder = max(subfolders, key=lambda x: x[1])[0]
-        logger.info(f"Latest subfolder for {child_prefix}: {latest_subfolder}")
+def _site_cache_path(child_prefix, suffix):
+    """Path of a per-site state file under CACHE_DIR"""
+    safe_prefix = child_prefix.strip('/').replace('/', '_').replace('\\', '_')
+    return os.path.join(CACHE_DIR, f"{safe_prefix}.{suffix}")
 
-        # Find the latest file in the subfolder
-        files = []
-        response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=latest_subfolder)
-        
-        for obj in response.get('Contents', []):
+def find_latest_nc_file(s3_client, bucket_name, folder):
+    """Return the key of the .nc file with the latest start hour in an S3 folder, or None"""
+    files = []
+    for page in list_s3_pages(s3_client, bucket_name, folder):
+        for obj in page.get('Contents', []):
             if obj['Key'].endswith('.nc'):
                 filename = obj['Key']
                 try:
@@ -257,17 +375,109 @@ def process_cl31_child(child_prefix, bucket_name='in-situ-592as8'):
                     logger.warning(f"Skipping file {filename}: {str(e)}")
                     continue
 
-        if not files:
+    if not files:
+        return None
+    return max(files, key=lambda x: x[1])[0]
+
+def find_current_subfolder(s3_client, bucket_name, child_prefix):
+    """Look for today's (or yesterday's) dated subfolder directly, without listing the site's history.
+
+    Subfolders are named '<child_prefix>CL31_<lat>_<lon>_YYYYMMDD/'. The part before the date is
+    remembered from the last full scan; returns (subfolder, latest_file) or (None, None) on a miss.
+    """
+    try:
+        with open(_site_cache_path(child_prefix, 'stem')) as f:
+            stem = f.read().strip()
+    except OSError:
+        return None, None
+
+    if not stem.startswith(child_prefix):
+        return None, None
+
+    now_utc = datetime.utcnow()
+    for day in (now_utc, now_utc - timedelta(days=1)):
+        subfolder = f"{stem}{day.strftime('%Y%m%d')}/"
+        latest_file = find_latest_nc_file(s3_client, bucket_name, subfolder)
+        if latest_file:
+            return subfolder, latest_file
+    return None, None
+
+def remember_subfolder_stem(child_prefix, subfolder):
+    """Record the dated subfolder naming stem so the next run can skip the full scan"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(_site_cache_path(child_prefix, 'stem'), 'w') as f:
+            f.write(subfolder[:-9])
+    except OSError as e:
+        logger.warning(f"Could not cache subfolder stem for {child_prefix}: {e}")
+
+@functools.lru_cache(maxsize=None)
+def ensure_recent_folder(bucket_name, child_prefix):
+    """Create the site's 'recent/' folder marker once; skip the HeadObject when already known to exist"""
+    stamp_path = _site_cache_path(child_prefix, 'recent.stamp')
+    if os.path.exists(stamp_path):
+        return
+
+    site_path = child_prefix.rstrip('/')  # e.g., 'CL31/Lexington'
+    recent_folder = f"{site_path}/recent/"
+    try:
+        s3.head_object(Bucket=bucket_name, Key=recent_folder)
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+            raise
+        s3.put_object(Bucket=bucket_name, Key=recent_folder)
+        logger.info(f"Created recent folder: {recent_folder}")
+
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        open(stamp_path, 'a').close()
+    except OSError as e:
+        logger.warning(f"Could not write recent folder stamp {stamp_path}: {e}")
+
+def process_cl31_child(child_prefix, bucket_name='in-situ-592as8'):
+    """Process a single CL31 child directory"""
+    try:
+        logger.info(f"Processing CL31 child directory: {child_prefix}")
+
+        # Ensure 'recent' folder exists directly under the site directory
+        ensure_recent_folder(bucket_name, child_prefix)
+
+        # Try today's/yesterday's subfolder first; fall back to scanning every subfolder
+        latest_subfolder, latest_file = find_current_subfolder(s3, bucket_name, child_prefix)
+
+        if latest_subfolder:
+            logger.info(f"Latest subfolder for {child_prefix}: {latest_subfolder}")
+        else:
+            # Get all subfolders within this child
+            subfolders = []
+            for page in list_s3_pages(s3, bucket_name, child_prefix, delimiter='/'):
+                for prefix in page.get('CommonPrefixes', []):
+                    subfolder = prefix.get('Prefix')
+                    if subfolder[-9:-1].isdigit() and len(subfolder[-9:-1]) == 8:
+                        date_str = subfolder[-9:-1]
+                        subfolders.append((subfolder, date_str))
+            
+            if not subfolders:
+                logger.warning(f"No valid date-formatted subfolders found in {child_prefix}")
+                return
+                
+            # Get the latest subfolder
+            latest_subfolder = max(subfolders, key=lambda x: x[1])[0]
+            logger.info(f"Latest subfolder for {child_prefix}: {latest_subfolder}")
+            remember_subfolder_stem(child_prefix, latest_subfolder)
+
+            # Find the latest file in the subfolder
+            latest_file = find_latest_nc_file(s3, bucket_name, latest_subfolder)
+
+        if not latest_file:
             logger.warning(f"No valid .nc files found in {latest_subfolder}")
             return
-            
-        latest_file = max(files, key=lambda x: x[1])[0]
         
         # Create unique temporary filename using child_prefix
         safe_prefix = child_prefix.replace('/', '_').replace('\\', '_')
         local_file = f"/tmp/{safe_prefix}{os.path.basename(latest_file)}"
         logger.info(f"Downloading {latest_file} to {local_file}")
-        s3_client.download_file(bucket_name, latest_file, local_file)
+        s3.download_file(bucket_name, latest_file, local_file, Config=DOWNLOAD_CONFIG)
         
         # Process the file
         process_single_file(local_file, latest_file, bucket_name)
@@ -279,8 +489,8 @@ def process_cl31_child(child_prefix, bucket_name='in-situ-592as8'):
     except Exception as e:
         logger.error(f"Error processing {child_prefix}: {e}", exc_info=True)
 
-def process_single_file(local_file, s3_path, bucket_name):
-    """Process a single netCDF file and generate/upload plots"""
+def process_single_file(local_file, s3_path, bucket_name, max_height=MAX_HEIGHT_M):
+    """Process a single netCDF file and generate/upload plots up to max_height metres"""
     try:
         plots_dir = '/tmp/cl31_plots'
         os.makedirs(plots_dir, exist_ok=True)
@@ -293,20 +503,20 @@ def process_single_file(local_file, s3_path, bucket_name):
             'backscatter_contour.png': f'{plots_dir}/{safe_prefix}_backscatter_contour.png'
         }
         
-        dataset = nc.Dataset(local_file, 'r')
-        
-        time_var = dataset.variables['time'][:]
-        time_datetime = pd.to_datetime(time_var, unit='s')
-        
-        df_non_height = pd.DataFrame({
-            'time': time_datetime,
-            'backscatter_sum': dataset.variables['backscatter_sum'][:],
-            'cbh_1': dataset.variables['cbh_1'][:],
-            'cbh_2': dataset.variables['cbh_2'][:],
-            'cbh_3': dataset.variables['cbh_3'][:],
-            'laser_temperature': dataset.variables['laser_temperature'][:],
-            'pulse_energy': dataset.variables['pulse_energy'][:]
-        })
+        # Read every variable the plots need exactly once, then hand plain arrays to the plots
+        with nc.Dataset(local_file, 'r') as dataset:
+            dataset.set_auto_maskandscale(False)
+
+            time_datetime = epoch_seconds_to_datetime64(read_variable(dataset, 'time'))
+            cbh = [read_variable(dataset, var) for var in ('cbh_1', 'cbh_2', 'cbh_3')]
+            diagnostics = {var: read_variable(dataset, var)
+                           for var in ('laser_temperature', 'pulse_energy', 'backscatter_sum')}
+            levels = read_variable(dataset, 'level') * 10
+
+            # Only read the backscatter profile up to the plotted ceiling (plus one level to reach the top edge)
+            num_levels = min(len(levels), int(np.searchsorted(levels, max_height, side='right')) + 1)
+            levels = levels[:num_levels]
+            backscatter = read_variable(dataset, 'backscatter', (slice(None), slice(0, num_levels)))
         
         parts = os.path.basename(local_file).split('_')
         lat = parts[3]
@@ -318,51 +528,49 @@ def process_single_file(local_file, s3_path, bucket_name):
         site_name = s3_path.split('/')[1]
         
         # Generate plots with site_name parameter
-        plot_cbh_vs_time(df_non_height, plot_paths['cbh_plot.png'], lat, lon, site_name)
-        plot_diagnostics_subplots(df_non_height, plot_paths['diagnostic_plot.png'], lat, lon, site_name)
-        plot_backscatter_contour_log(dataset, plot_paths['backscatter_contour.png'], lat, lon, site_name)
+        plot_cbh_vs_time(time_datetime, cbh, plot_paths['cbh_plot.png'], lat, lon, site_name)
+        plot_diagnostics_subplots(time_datetime, diagnostics, plot_paths['diagnostic_plot.png'], lat, lon, site_name)
+        plot_backscatter_contour_log(time_datetime, levels, backscatter, plot_paths['backscatter_contour.png'],
+                                     lat, lon, site_name, max_height=max_height)
         
         # Upload plots to both locations
-        s3_client = boto3.client('s3')
-        
         # Get the site path (e.g., 'CL31/Lexington' or 'CL31/CliffB')
         site_parts = s3_path.split('/')[:3]
         site_path = '/'.join(site_parts[:-1])  # Excludes the date folder
         
-        for plot_name, local_plot_path in plot_paths.items():
-            # Upload to date-specific folder with unique name
-            dated_plot_path = f"{s3_path[:-3]}_{plot_name}"
-            upload_to_s3(local_plot_path, bucket_name, dated_plot_path)
-            
-            # Upload to recent folder with simple name
-            recent_plot_path = f"{site_path}/recent/{plot_name}"
-            upload_to_s3(local_plot_path, bucket_name, recent_plot_path)
+        # Publish the plots concurrently on the shared client
+        with ThreadPoolExecutor(max_workers=len(plot_paths)) as executor:
+            futures = []
+            for plot_name, local_plot_path in plot_paths.items():
+                # Upload to date-specific folder with unique name
+                dated_plot_path = f"{s3_path[:-3]}_{plot_name}"
+                
+                # Copy to recent folder with simple name
+                recent_plot_path = f"{site_path}/recent/{plot_name}"
+                
+                futures.append(executor.submit(publish_plot, local_plot_path, bucket_name,
+                                               dated_plot_path, recent_plot_path, s3))
             
-            os.remove(local_plot_path)
-        
-        dataset.close()
+            for future in futures:
+                future.result()
         
     except Exception as e:
         logger.error(f"Error processing file {local_file}: {e}", exc_info=True)
         raise
 
-# Run the processing logic in a sequential loop
+# Run the processing logic across sites in a thread pool
 if __name__ == "__main__":
     try:
         # Get all direct children of CL31/ (this replaces the looping logic)
-        s3_client = boto3.client('s3')
-        response = s3_client.list_objects_v2(
-            Bucket='in-situ-592as8',
-            Prefix='CL31/',
-            Delimiter='/'
-        )
-        
-        cl31_children = [p.get('Prefix') for p in response.get('CommonPrefixes', [])]
+        cl31_children = [p.get('Prefix')
+                         for page in list_s3_pages(s3, 'in-situ-592as8', 'CL31/', delimiter='/')
+                         for p in page.get('CommonPrefixes', [])]
         logger.info(f"Found CL31 children: {cl31_children}")
         
-        # Process each child sequentially
-        for child in cl31_children:
-            process_cl31_child(child)
+        # Process children concurrently; each site is an independent download/plot/upload
+        if cl31_children:
+            with ThreadPoolExecutor(max_workers=min(MAX_SITE_WORKERS, len(cl31_children))) as executor:
+                list(executor.map(process_cl31_child, cl31_children))
             
     except Exception as e:
         logger.error(f"Error in script execution: {e}", exc_info=True)
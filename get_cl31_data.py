@@ -2,6 +2,7 @@ import socket
 import os
 from datetime import datetime
 import sys
+import time
 
 # Define the IP and port of the CL31 ceilometer
 CEILOMETER_IP = '192.168.127.254'
@@ -11,6 +12,10 @@ CEILOMETER_PORT = 4001
 START_MARKER = b'\x01'
 END_MARKER = b'\x04'
 
+# Packets are written through a 64 KB buffer and flushed at most once per second
+WRITE_BUFFER_SIZE = 64 * 1024
+FLUSH_INTERVAL = 1.0
+
 def get_file_time_range():
     # Get the current time in UTC
     now_utc = datetime.utcnow()
@@ -53,6 +58,14 @@ def create_dat_file_path(base_folder, lat, lon):
     return save_path
     
 
+def close_dat_file(f):
+    """Flush and fsync any buffered packets before closing a .dat file"""
+    if f.closed:
+        return
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+
 def capture_ceilometer_data(base_folder, lat, lon):
     try:
         # Create the initial file path
@@ -65,10 +78,21 @@ def capture_ceilometer_data(base_folder, lat, lon):
             print(f"Connected to Ceilometer at {CEILOMETER_IP}:{CEILOMETER_PORT}")
 
             # Open the .dat file in append mode to store the data stream in ASCII
-            with open(dat_file_path, 'ab') as f:
+            f = open(dat_file_path, 'ab', buffering=WRITE_BUFFER_SIZE)
+            try:
                 print(f"Saving data to {dat_file_path}")
 
-                buffer = b''  # Buffer to collect data for a complete packet
+                # Mutable buffer: appends and consumed-prefix deletes happen in place instead of copying
+                buffer = bytearray()
+                last_flush = time.monotonic()
+
+                # The '-YYYY-MM-DD HH:MM:' part of the timestamp only changes once a minute
+                cached_minute = None
+                cached_prefix = b''
+
+                # Monotonic deadline of the next file rotation check; scheduling on the monotonic clock
+                # means a backwards wall-clock step (e.g. an NTP correction) cannot postpone rotation
+                next_rotation_check = 0.0
 
                 while True:
                     # Receive data in chunks
@@ -77,47 +101,55 @@ def capture_ceilometer_data(base_folder, lat, lon):
                         print("No data received. Connection closed by the ceilometer.")
                         break
 
-                    # Check if it's time to start a new file
-                    current_file_path = create_dat_file_path(base_folder, lat, lon)
-                    if current_file_path != dat_file_path:
-                        f.close()
-                        dat_file_path = current_file_path
-                        print(f"Starting a new file: {dat_file_path}")
-                        f = open(dat_file_path, 'ab')
+                    # Check if it's time to start a new file; the path only changes on 6-hour
+                    # boundaries, so checking on the first packet of each minute is enough
+                    now = time.monotonic()
+                    if now >= next_rotation_check:
+                        # Wait until the next wall-clock minute boundary, never more than a minute
+                        next_rotation_check = now + 60 - time.time() % 60
+                        current_file_path = create_dat_file_path(base_folder, lat, lon)
+                        if current_file_path != dat_file_path:
+                            close_dat_file(f)
+                            dat_file_path = current_file_path
+                            print(f"Starting a new file: {dat_file_path}")
+                            f = open(dat_file_path, 'ab', buffering=WRITE_BUFFER_SIZE)
 
                     # Append received data to buffer
-                    buffer += data
+                    buffer.extend(data)
 
                     # Look for the end marker (`\x04`)
-                    while END_MARKER in buffer:
-                        end_idx = buffer.index(END_MARKER) + 1  # Include the `\x04` in the packet
-
-                        # Extract the complete packet up to the end marker `\x04`
-                        complete_packet = buffer[:end_idx]
+                    end_idx = buffer.find(END_MARKER)
+                    while end_idx != -1:
+                        end_idx += 1  # Include the `\x04` in the packet
 
                         # Check for the start of the packet using `\x01`
-                        if START_MARKER in complete_packet:
-                            start_idx = complete_packet.index(START_MARKER)
-
-                            # Capture the current timestamp
-                            current_time = datetime.utcnow().strftime('-%Y-%m-%d %H:%M:%S\n').encode('ascii')
-
-                            # Write the timestamp on a new line before the packet
-                            f.write(b"\n")  # Ensure the new line before the timestamp
-                            f.write(current_time)  # Write the timestamp
+                        start_idx = buffer.find(START_MARKER, 0, end_idx)
+                        if start_idx != -1:
+                            # Capture the current timestamp, reformatting the date part only when the minute changes
+                            now_s = int(time.time())
+                            minute = now_s // 60
+                            if minute != cached_minute:
+                                cached_minute = minute
+                                cached_prefix = time.strftime('-%Y-%m-%d %H:%M:', time.gmtime(now_s)).encode('ascii')
+                            current_time = cached_prefix + b'%02d\n' % (now_s % 60)
+
+                            # Write the timestamp on a new line, then the packet starting from the start marker
+                            packet_data = bytes(buffer[start_idx:end_idx])
+                            f.write(b"\n" + current_time + packet_data + b"\n")
                             print(current_time.decode('ascii'), end='')
-
-                            # Then, write the packet starting from the start marker
-                            packet_data = complete_packet[start_idx:]
-                            f.write(packet_data)
-                            f.write(b"\n")  # Ensure a new line after the packet
                             print(packet_data.decode('ascii', errors='replace'))
 
-                        # Flush to ensure data is saved immediately
-                        f.flush()
-
                         # Remove the processed part from the buffer
-                        buffer = buffer[end_idx:]
+                        del buffer[:end_idx]
+                        end_idx = buffer.find(END_MARKER)
+
+                    # Flush periodically rather than after every packet
+                    now = time.monotonic()
+                    if now - last_flush >= FLUSH_INTERVAL:
+                        f.flush()
+                        last_flush = now
+            finally:
+                close_dat_file(f)
                         
     except Exception as e:
         print(f"Error: {e}")
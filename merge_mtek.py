@@ -1,8 +1,62 @@
 import os
+import re
 import glob
+from datetime import datetime, timedelta
 import xarray as xr
 import pandas as pd
 
+def _filename_date(file_path):
+    """
+    Extract a YYYYMMDD date embedded in a file name.
+
+    Args:
+        file_path (str): Path to the file.
+
+    Returns:
+        datetime.date or None: The embedded date, or None if the name does not carry one.
+    """
+    match = re.search(r'(\d{8})', os.path.basename(file_path))
+    if not match:
+        return None
+    try:
+        return datetime.strptime(match.group(1), '%Y%m%d').date()
+    except ValueError:
+        return None
+
+def _file_in_time_range(file_path, start_date, end_date):
+    """
+    Check whether a NetCDF file can contain data within [start_date, end_date].
+
+    The decision is made from the date in the file name where possible: files dated more
+    than a day outside the range are rejected and files dated inside it are accepted, both
+    without being opened (the merged dataset is trimmed to the range afterwards). Only files
+    without a date, or dated on a boundary day, have their time variable read.
+
+    Args:
+        file_path (str): Path to the .nc file.
+        start_date (pandas.Timestamp): Start of the desired date/time range.
+        end_date (pandas.Timestamp): End of the desired date/time range.
+
+    Returns:
+        bool: True if the file overlaps the range.
+    """
+    file_date = _filename_date(file_path)
+    if file_date is not None:
+        # Allow a day of slack for files that start late on the previous day
+        first_day = start_date.date() - timedelta(days=1)
+        last_day = end_date.date()
+        if not (first_day <= file_date <= last_day):
+            return False
+        if first_day < file_date < last_day:
+            return True
+
+    with xr.open_dataset(file_path, engine='h5netcdf') as ds:
+        times = ds['time'].values
+
+    if times.size == 0:
+        return False
+    return pd.Timestamp(times.min()) <= end_date and pd.Timestamp(times.max()) >= start_date
+
 def merge_metek_nc_files(folder_path, output_file, start_date, end_date):
     """
     Merge multiple NetCDF (.nc) files from a specified folder into a single file,
@@ -29,17 +83,28 @@ def merge_metek_nc_files(folder_path, output_file, start_date, end_date):
         if not files:
             raise ValueError(f"No .nc files found in folder: {folder_path}")
         
-        # Open and merge all NetCDF files along common coordinates (e.g., time)
-        ds = xr.open_mfdataset(files, combine='by_coords')
+        # Only open the files that can overlap the requested time range
+        files = [f for f in files if _file_in_time_range(f, start_date, end_date)]
+        
+        if not files:
+            raise ValueError(f"No .nc files in {folder_path} overlap {start_date} to {end_date}")
+        
+        # Open all NetCDF files in parallel and concatenate them along time in filename order.
+        # Variables without a time dimension are taken from the first file instead of being
+        # compared across every file.
+        ds = xr.open_mfdataset(files, combine='nested', concat_dim='time', parallel=True,
+                               engine='h5netcdf', chunks={'time': 1024},
+                               data_vars='minimal', coords='minimal', compat='override')
         
         # Ensure the time coordinate is in datetime format
         ds['time'] = pd.to_datetime(ds['time'].values)
         
-        # Filter the dataset based on the specified time range
-        merged_ds = ds.sel(time=slice(start_date, end_date))
+        # Nested concatenation keeps filename order, so order by time value before slicing
+        merged_ds = ds.sortby('time').sel(time=slice(start_date, end_date))
         
-        # Save the merged dataset to the output NetCDF file
-        merged_ds.to_netcdf(output_file)
+        # Save the merged dataset to the output NetCDF file with light compression
+        encoding = {var: {'zlib': True, 'complevel': 3} for var in merged_ds.data_vars}
+        merged_ds.to_netcdf(output_file, engine='h5netcdf', encoding=encoding)
         
         print(f"Merged dataset saved to: {output_file}")
         
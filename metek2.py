@@ -5,13 +5,109 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+from numba import njit
 
-def plot_metek_two_fields(folder_path, start_date, end_date, colorbar_ranges=None, colormaps=None, alpha=0.5):
+@njit(cache=True)
+def _mask_and_range(data, vmin, vmax):
     """
-    Overlay METEK radar data from multiple NetCDF files on a single figure with two subplots:
+    Set values outside [vmin, vmax] to NaN in place and return the min/max of what remains.
+    
+    Fuses the range masking and the colour-limit reductions into one serial pass; the compiled
+    kernel is cached on disk so each run of the script does not pay for compiling it again.
+    Threading is left off because a plot grid is too small for it to outweigh its start-up cost.
+    fastmath is deliberately left off: it would let the compiler assume there are no NaNs.
+    
+    Args:
+        data (numpy.ndarray): 1-D float array, modified in place.
+        vmin (float): Lower bound of the valid range.
+        vmax (float): Upper bound of the valid range.
+    
+    Returns:
+        tuple: (min, max) of the remaining finite values ((inf, -inf) if none remain).
+    """
+    lo = np.inf
+    hi = -np.inf
+    for i in range(data.size):
+        v = data[i]
+        if np.isnan(v) or v < vmin or v > vmax:
+            data[i] = np.nan
+        else:
+            lo = min(lo, v)
+            hi = max(hi, v)
+    return lo, hi
+
+def _is_uniform(values, tol=0.01):
+    """
+    Check whether a 1-D coordinate lies on a regular grid.
+    
+    Values are compared with the evenly spaced grid from the first to the last value, so
+    spacing drift that accumulates along a long series is caught as well as jitter.
+    
+    Args:
+        values (numpy.ndarray): Coordinate values.
+        tol (float): Allowed deviation from the grid as a fraction of one step.
+    
+    Returns:
+        bool: True if there are at least two values and each lies within tol steps of the grid.
+    """
+    if values.ndim != 1 or values.size < 2:
+        return False
+    step = (values[-1] - values[0]) / (values.size - 1)
+    if step == 0:
+        return False
+    grid = np.linspace(values[0], values[-1], values.size)
+    return bool(np.max(np.abs(values - grid)) <= tol * abs(step))
+
+def _field_as_float32(data_array):
+    """
+    Load a field as a contiguous float32 array, applying its CF fill values and scaling.
+    
+    The plotting dataset is decoded with mask_and_scale=False so xarray does not promote
+    packed or masked fields to float64; the equivalent decoding is done here in float32.
+    As in read_variable (download_and_plot.py), _FillValue, missing_value (which may hold
+    several values) and valid_range/valid_min/valid_max are applied to the packed values,
+    before scaling.
+    
+    Args:
+        data_array (xarray.DataArray): Field decoded with mask_and_scale=False.
+    
+    Returns:
+        numpy.ndarray: float32 values with fill values set to NaN.
+    """
+    attrs = data_array.attrs
+    data = np.ascontiguousarray(data_array.values, dtype=np.float32)
+    
+    missing = np.zeros(data.shape, dtype=bool)
+    for attr in ('_FillValue', 'missing_value'):
+        if attr in attrs:
+            missing |= np.isin(data, np.asarray(attrs[attr], dtype=np.float32))
+    if 'valid_range' in attrs:
+        valid_min, valid_max = attrs['valid_range']
+    else:
+        valid_min = attrs.get('valid_min')
+        valid_max = attrs.get('valid_max')
+    if valid_min is not None:
+        missing |= data < np.float32(valid_min)
+    if valid_max is not None:
+        missing |= data > np.float32(valid_max)
+    data[missing] = np.float32(np.nan)
+    
+    if 'scale_factor' in attrs:
+        data *= np.float32(attrs['scale_factor'])
+    if 'add_offset' in attrs:
+        data += np.float32(attrs['add_offset'])
+    
+    return data
+
+def plot_metek_two_fields(folder_path, start_date, end_date, colorbar_ranges=None, colormaps=None):
+    """
+    Plot METEK radar data merged from multiple NetCDF files on a single figure with two subplots:
       - Top subplot: Liquid Water Content (LWC)
       - Bottom subplot: Reflectivity (Zea)
-    Data from each file is overlaid (with transparency) and restricted to a specified time range.
+    The files are concatenated along time and restricted to a specified time range.
     
     Args:
         folder_path (str): Path to the folder containing .nc files.
@@ -19,7 +115,6 @@ def plot_metek_two_fields(folder_path, start_date, end_date, colorbar_ranges=Non
         end_date (str or datetime-like): End of the desired time range.
         colorbar_ranges (dict): Dictionary of {field: (min, max)} for colorbar limits.
         colormaps (dict): Dictionary of {field: cmap_name} for colormaps.
-        alpha (float): Transparency for each file's plot overlay (0 to 1).
     
     Returns:
         None
@@ -44,67 +139,70 @@ def plot_metek_two_fields(folder_path, start_date, end_date, colorbar_ranges=Non
         fig, axes = plt.subplots(nrows=2, ncols=1, figsize=(12, 8))
         axes = axes.flatten()  # axes[0] for LWC, axes[1] for Reflectivity
         
-        # To store the first mesh objects for adding colorbars later
-        first_mesh = [None] * len(fields)
-        
-        # Loop over each file in the folder
-        for file_path in nc_files:
-            ds = xr.open_dataset(file_path)
+        # Open every file at once: metadata is read in parallel on the dask scheduler and
+        # non-time variables are taken from the first file instead of compared across all of them,
+        # with an explicit engine so no per-file format sniffing is done; the with block closes
+        # every file handle once plotting is done
+        with xr.open_mfdataset(nc_files, combine='by_coords', parallel=True, chunks={'time': 200},
+                               data_vars='minimal', coords='minimal', compat='override',
+                               engine='h5netcdf', decode_cf=False) as raw_ds:
+            ds = xr.decode_cf(raw_ds, mask_and_scale=False)
             
             # Ensure 'range' is a coordinate
             if 'range' not in ds.coords and 'range' in ds:
                 ds = ds.assign_coords(range=ds['range'])
             
-            # Convert the 'time' coordinate to datetime and slice the dataset
-            ds['time'] = pd.to_datetime(ds['time'].values)
-            ds_sel = ds.sel(time=slice(start_date, end_date))
+            # Order the time coordinate (already datetime64 from CF decoding) and slice the dataset once
+            ds_sel = ds.sortby('time').sel(time=slice(start_date, end_date))
             
-            # Skip files with no data in the specified time range
             if ds_sel['time'].size == 0:
-                ds.close()
-                continue
-            
-            # Convert time values for plotting (matplotlib date numbers) and get range values
-            time_vals = mdates.date2num(ds_sel['time'].values)
-            range_vals = ds_sel['range'].values
-            
-            # Loop over the two fields and overlay the data on the corresponding subplot
-            for i, (field, title) in enumerate(fields):
-                if field in ds_sel:
-                    data = ds_sel[field].values
-                    
-                    # Apply custom colorbar limits if provided
-                    if colorbar_ranges and field in colorbar_ranges:
-                        vmin, vmax = colorbar_ranges[field]
-                        data = np.where((data >= vmin) & (data <= vmax), data, np.nan)
-                    else:
-                        vmin, vmax = np.nanmin(data), np.nanmax(data)
-                    
-                    # Choose colormap (default to 'viridis' if not provided)
-                    cmap = colormaps[field] if colormaps and field in colormaps else 'viridis'
-                    
-                    # Plot using pcolormesh (data transposed so time is x and range is y)
-                    mesh = axes[i].pcolormesh(time_vals, range_vals, data.T, shading='auto',
-                                               cmap=cmap, vmin=vmin, vmax=vmax, alpha=alpha)
-                    
-                    # Store the first mesh handle for the colorbar
-                    if first_mesh[i] is None:
-                        first_mesh[i] = mesh
-                    
-                    # Set axis labels and title (only once)
-                    if not axes[i].get_title():
+                print(f"No data between {start_date} and {end_date} in folder: {folder_path}")
+            else:
+                # Convert time values for plotting (matplotlib date numbers) once for both subplots
+                time_vals = mdates.date2num(ds_sel['time'].values)
+                range_vals = ds_sel['range'].values
+                
+                # Draw each field with a single mesh covering every merged file
+                for i, (field, title) in enumerate(fields):
+                    if field in ds_sel:
+                        # float32 is plenty for plotting and halves the bytes moved below
+                        data = _field_as_float32(ds_sel[field])
+                        
+                        # Apply custom colorbar limits if provided (masked in place), otherwise use the data range;
+                        # data is contiguous, so reshape(-1) is a view the kernel writes through
+                        if colorbar_ranges and field in colorbar_ranges:
+                            vmin, vmax = colorbar_ranges[field]
+                            _mask_and_range(data.reshape(-1), float(vmin), float(vmax))
+                        else:
+                            vmin, vmax = _mask_and_range(data.reshape(-1), -np.inf, np.inf)
+                        if vmin > vmax:
+                            # No finite values (the kernel returns (inf, -inf)); let matplotlib choose
+                            vmin = vmax = None
+                        
+                        # Choose colormap (default to 'viridis' if not provided)
+                        cmap = colormaps[field] if colormaps and field in colormaps else 'viridis'
+                        
+                        # Data transposed so time is x and range is y. A regular grid is drawn as a single
+                        # image; otherwise fall back to pcolormesh's per-cell quads
+                        if _is_uniform(time_vals) and _is_uniform(range_vals):
+                            half_dt = (time_vals[-1] - time_vals[0]) / (2 * (time_vals.size - 1))
+                            half_dr = (range_vals[-1] - range_vals[0]) / (2 * (range_vals.size - 1))
+                            extent = [time_vals[0] - half_dt, time_vals[-1] + half_dt,
+                                      range_vals[0] - half_dr, range_vals[-1] + half_dr]
+                            mesh = axes[i].imshow(data.T, aspect='auto', origin='lower', extent=extent,
+                                                  cmap=cmap, vmin=vmin, vmax=vmax, interpolation='nearest')
+                        else:
+                            mesh = axes[i].pcolormesh(time_vals, range_vals, data.T, shading='auto',
+                                                       cmap=cmap, vmin=vmin, vmax=vmax)
+                        mesh.set_rasterized(True)
+                        plt.colorbar(mesh, ax=axes[i])
+                        
+                        # Set axis labels and title
                         axes[i].set_title(title)
                         axes[i].set_xlabel('Time (UTC)')
                         axes[i].set_ylabel('Range (m)')
                         axes[i].xaxis_date()
                         axes[i].xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
-            
-            ds.close()
-        
-        # Add a colorbar to each subplot using the stored mesh handle
-        for i, mesh in enumerate(first_mesh):
-            if mesh is not None:
-                plt.colorbar(mesh, ax=axes[i])
         
         plt.tight_layout()
         plt.show()
@@ -112,6 +210,20 @@ def plot_metek_two_fields(folder_path, start_date, end_date, colorbar_ranges=Non
     except Exception as e:
         print("An error occurred:", e)
 
+def _variables_to_drop(nc_file, keep):
+    """
+    List the variables in a NetCDF file that are not needed, for use as drop_variables.
+    
+    Args:
+        nc_file (str): Path to a representative .nc file.
+        keep (iterable of str): Names of the variables to keep.
+    
+    Returns:
+        list of str: Names of every other variable in the file.
+    """
+    with xr.open_dataset(nc_file, engine='h5netcdf', decode_cf=False) as ds:
+        return [name for name in ds.variables if name not in keep]
+
 def save_lwc_profiles_df(folder_path, profile_times, profile_save_path):
     """
     Merge data from multiple NetCDF files in the specified folder and, for each profile time,
@@ -132,34 +244,52 @@ def save_lwc_profiles_df(folder_path, profile_times, profile_save_path):
         if not nc_files:
             raise FileNotFoundError("No .nc files found in folder: " + folder_path)
         
-        # Merge datasets using open_mfdataset (assumes compatible time coordinates)
-        ds = xr.open_mfdataset(nc_files, combine='by_coords')
-        ds['time'] = pd.to_datetime(ds['time'].values)
-        
-        rows = []
-        for time_str in profile_times:
-            # Convert profile time to Timestamp
-            profile_time = pd.to_datetime(time_str)
-            # Select the nearest time sample for the given profile time
-            ds_sel = ds.sel(time=profile_time, method='nearest')
+        # Merge datasets using open_mfdataset (assumes compatible time coordinates), reading only
+        # LWC/range/time and skipping per-file CF decoding and variable equality checks
+        drop_variables = _variables_to_drop(nc_files[0], keep=('LWC', 'range', 'time'))
+        with xr.open_mfdataset(nc_files, combine='by_coords', parallel=True, chunks={'time': 500},
+                               data_vars='minimal', coords='minimal', compat='override',
+                               engine='h5netcdf', decode_cf=False,
+                               drop_variables=drop_variables) as raw_ds:
+            ds = xr.decode_cf(raw_ds)
+            ds['time'] = pd.to_datetime(ds['time'].values)
+            
+            if 'LWC' not in ds:
+                print(f"LWC variable not found in folder: {folder_path}. Skipping profiles.")
+                return
             
-            if 'LWC' not in ds_sel:
-                print(f"LWC variable not found for time {profile_time}. Skipping.")
-                continue
+            # Select the nearest time sample for every profile time in one vectorized lookup
+            times = pd.to_datetime(profile_times)
+            ds_sel = ds[['LWC', 'range']].sel(time=times, method='nearest')
             
-            # Extract the LWC profile and corresponding altitude values
-            lwc_profile = ds_sel['LWC'].values  # Assumed to be 1D (over 'range')
+            # Extract the LWC profiles (time x range) and the corresponding altitude values
+            lwc_2d = ds_sel['LWC'].transpose('time', ...).values
             altitudes = ds_sel['range'].values
             
-            # For each altitude point, add a row with the selected time, altitude, and LWC value
-            for alt, lwc in zip(altitudes, lwc_profile):
-                rows.append({'time': profile_time, 'alt': alt, 'lwc': lwc})
-        
-        # Create a DataFrame and save it as a tab-delimited text file
-        df = pd.DataFrame(rows)
-        df.to_csv(profile_save_path, sep='\t', index=False)
+            # One row per (profile time, altitude) pair, labelled with the requested profile time
+            num_times, num_alts = lwc_2d.shape
+            df = pd.DataFrame({
+                'time': times.repeat(num_alts),
+                'alt': np.tile(altitudes, num_times),
+                'lwc': lwc_2d.ravel()
+            })
+            
+            # Save the DataFrame as a tab-delimited text file with Arrow's vectorized CSV writer,
+            # keeping to_csv's output: times are cast to whole seconds so they print as
+            # 'YYYY-MM-DD HH:MM:SS', and altitudes are formatted once per level by NumPy (Arrow
+            # would print 100.0 as 100) and repeated for every profile
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.set_column(0, 'time', pc.cast(table['time'], pa.timestamp('s'), safe=False))
+            alt_text = pa.array([str(alt) for alt in altitudes], type=pa.string())
+            table = table.set_column(1, 'alt', pc.take(alt_text, pa.array(np.tile(np.arange(num_alts), num_times))))
+            
+            # quoting_style does not apply to the header, so write it unquoted here
+            with open(profile_save_path, 'wb') as out:
+                out.write('\t'.join(table.column_names).encode('ascii') + b'\n')
+                pacsv.write_csv(table, out,
+                                write_options=pacsv.WriteOptions(include_header=False, delimiter='\t',
+                                                                 quoting_style='none'))
         
-        ds.close()
         print(f"LWC profiles saved to: {profile_save_path}")
         
     except Exception as e:
@@ -193,8 +323,7 @@ profile_times = [
 # First, create the two-subplot plot for visualization
 plot_metek_two_fields(folder_path, start_time, end_time,
                       colorbar_ranges=custom_colorbar_ranges,
-                      colormaps=custom_colormaps,
-                      alpha=1)
+                      colormaps=custom_colormaps)
 
 # Then, save the LWC vs. altitude profiles for the specified times to a text file in a DataFrame-like format
 save_lwc_profiles_df(folder_path, profile_times, profile_save_path)
@@ -10,19 +10,56 @@ import boto3
 from datetime import datetime
 from botocore.exceptions import NoCredentialsError
 from botocore.config import Config
+from boto3.s3.transfer import TransferConfig
 import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
 
-# Configure the S3 client with retry and timeout settings
+# Up to this many uploads run in the background, each sending this many parts at once
+UPLOAD_WORKERS = 4
+UPLOAD_PART_CONCURRENCY = 8
+
+# Configure the S3 client with retry and timeout settings; every background upload shares this
+# client, so its connection pool is sized for all of their parts to be in flight at once
 config = Config(
     retries={
         'max_attempts': 10,
         'mode': 'standard'
     },
     connect_timeout=5,
-    read_timeout=5
+    read_timeout=5,
+    max_pool_connections=UPLOAD_WORKERS * UPLOAD_PART_CONCURRENCY
 )
 s3 = boto3.client('s3', config=config, region_name='us-east-1')
 
+# Upload NetCDF files larger than 8 MB as 8 MB parts sent in parallel
+TRANSFER_CFG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=UPLOAD_PART_CONCURRENCY,
+    use_threads=True
+)
+
+# Uploads run in the background so the next cl2nc conversion is not held up by S3
+executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS)
+# Uploads not yet recorded, keyed by local NetCDF path (cl2nc must not rewrite a file still being
+# uploaded): {NetCDF path: (future, .dat path, .dat mtime when converted)}
+pending_uploads = {}
+
+# The ceilometer appends to its .dat file about once a second, so a file still being written is
+# only reconverted this often (seconds; override with CL31_PROCESS_INTERVAL). Files closed by the
+# logger on rotation are converted straight away
+PROCESS_INTERVAL = int(os.environ.get('CL31_PROCESS_INTERVAL', '300'))
+
+# The logger starts a new .dat file every 6 hours; files last written more than a week of
+# rotations ago are dropped from the processed record so it does not grow without bound, and
+# are not caught up at startup
+ROTATION_PERIOD = 6 * 3600
+PROCESSED_RETENTION = 28 * ROTATION_PERIOD
+
 # Function to configure routing to ensure Wi-Fi is used for internet
 
 
@@ -33,36 +70,139 @@ def upload_to_s3(local_file, bucket_name, s3_file_path):
     
     try:
         print(f"[{datetime.now()}] Uploading {local_file} using Wi-Fi...")
-        s3.upload_file(local_file, bucket_name, s3_file_path)
+        s3.upload_file(local_file, bucket_name, s3_file_path, Config=TRANSFER_CFG)
         print(f"[{datetime.now()}] File {local_file} uploaded to bucket {bucket_name} as {s3_file_path}.")
+        return True
     except NoCredentialsError:
         print("Credentials not available.")
     except Exception as e:
         print(f"Error occurred during upload: {e}")
+    return False
 
-# Function to find the latest .dat file in the folder structure
-def find_latest_dat_file(base_folder):
-    print(f"[{datetime.now()}] Searching for latest .dat file in {base_folder}")
-    latest_file = None
-    latest_time = None
-
-    for root, dirs, files in os.walk(base_folder):
-        for file in files:
-            if file.endswith('.dat'):
-                file_path = os.path.join(root, file)
-                file_time = os.path.getmtime(file_path)
-                print(f"[{datetime.now()}] Found file: {file_path} with timestamp {file_time}")
-
-                if latest_time is None or file_time > latest_time:
-                    latest_file = file_path
-                    latest_time = file_time
-
-    if latest_file:
-        print(f"[{datetime.now()}] Latest .dat file found: {latest_file}")
-    else:
-        print(f"[{datetime.now()}] No .dat files found.")
-    
-    return latest_file
+# Function to drop processed entries whose .dat file is gone or older than PROCESSED_RETENTION
+def prune_processed(processed):
+    horizon = time.time() - PROCESSED_RETENTION
+    for dat_file, dat_time in list(processed.items()):
+        if dat_time < horizon or not os.path.exists(dat_file):
+            del processed[dat_file]
+
+# Function to load the {.dat path: mtime} record of files already converted and uploaded
+def load_processed(state_file):
+    try:
+        with open(state_file) as f:
+            processed = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    prune_processed(processed)
+    return processed
+
+# Function to save the processed-file record atomically (write a temp file, then rename over)
+def save_processed(processed, state_file):
+    tmp_file = f"{state_file}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(processed, f)
+    os.replace(tmp_file, state_file)
+
+# Function to collect finished background uploads, recording the .dat files that were uploaded
+# successfully; returns the .dat files whose upload failed so they can be queued again
+def record_uploaded(processed, state_file):
+    changed = False
+    failed = []
+    for path, (future, dat_file, dat_time) in list(pending_uploads.items()):
+        if not future.done():
+            continue
+        del pending_uploads[path]
+        if future.exception() is None and future.result():
+            processed[dat_file] = dat_time
+            changed = True
+        else:
+            print(f"[{datetime.now()}] Background upload of {path} failed; {dat_file} will be converted again")
+            failed.append(dat_file)
+
+    if changed:
+        prune_processed(processed)
+        save_processed(processed, state_file)
+    return failed
+
+# Function to list every .dat file in the folder structure with its mtime (only run once, at startup)
+def find_dat_files(base_folder):
+    print(f"[{datetime.now()}] Searching for .dat files in {base_folder}")
+    dat_files = {}
+
+    # Walk the tree with os.scandir, which returns each entry's type and stat without extra calls
+    to_scan = [base_folder]
+    while to_scan:
+        dir_path = to_scan.pop()
+        try:
+            with os.scandir(dir_path) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        to_scan.append(entry.path)
+                    elif entry.name.endswith('.dat') and entry.is_file():
+                        dat_files[entry.path] = entry.stat().st_mtime
+        except (FileNotFoundError, PermissionError):
+            # Removed while the tree was being walked, or not readable by this user
+            continue
+
+    print(f"[{datetime.now()}] Found {len(dat_files)} .dat files.")
+    return dat_files
+
+# Filesystem event handler that records .dat files written under the raw folder; only a file
+# being closed after writing (the logger rotating to a new file) wakes the main loop early
+class DatFileHandler(FileSystemEventHandler):
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.changed_files = set()
+        self.file_closed = threading.Event()
+
+    def record(self, path, closed=False):
+        if path.endswith('.dat'):
+            with self.lock:
+                self.changed_files.add(path)
+            if closed:
+                self.file_closed.set()
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.record(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.record(event.src_path)
+
+    def on_closed(self, event):
+        if not event.is_directory:
+            self.record(event.src_path, closed=True)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.record(event.dest_path, closed=True)
+
+    # Return (and forget) every .dat file changed since the last call
+    def take_changed_files(self):
+        with self.lock:
+            self.file_closed.clear()
+            paths, self.changed_files = self.changed_files, set()
+        return sorted(paths)
+
+# Function to convert and upload a .dat file unless it is unchanged since its last upload
+def process_if_changed(dat_file, processed, output_folder, bucket_name, lat, lon):
+    try:
+        # Take the mtime before converting so data appended during cl2nc is picked up next time
+        dat_time = os.path.getmtime(dat_file)
+    except FileNotFoundError:
+        return
+
+    in_flight = any(entry[1:] == (dat_file, dat_time) for entry in pending_uploads.values())
+    if processed.get(dat_file) == dat_time or in_flight:
+        print(f"[{datetime.now()}] {dat_file} is unchanged since its last upload. Skipping.")
+        return
+
+    print(f"[{datetime.now()}] Processing .dat file: {dat_file}")
+    s3_folder = generate_s3_folder(lat, lon)
+
+    process_cl2nc_and_separate_data(dat_file, output_folder, bucket_name, s3_folder, dat_time)
 
 # Function to generate the S3 folder path based on lat, lon, and date
 def generate_s3_folder(lat, lon):
@@ -72,33 +212,41 @@ def generate_s3_folder(lat, lon):
     return folder_path
 
 # Function to process the .dat file, convert it to NetCDF, and separate non-height data
-def process_cl2nc_and_separate_data(input_dat_file, output_folder, bucket_name, s3_folder):
+def process_cl2nc_and_separate_data(input_dat_file, output_folder, bucket_name, s3_folder, dat_time):
     print(f"[{datetime.now()}] Processing .dat file: {input_dat_file}")
     file_name = os.path.basename(input_dat_file).replace('.dat', '')
     backscatter_path = os.path.join(output_folder, f'{file_name}.nc')
 
+    # Let a previous upload of the same NetCDF file finish before cl2nc overwrites it
+    previous_upload = pending_uploads.get(backscatter_path)
+    if previous_upload is not None and not previous_upload[0].done():
+        print(f"[{datetime.now()}] Waiting for previous upload of {backscatter_path} to finish")
+        previous_upload[0].result()
+
     try:
         print(f"[{datetime.now()}] Running cl2nc to convert {input_dat_file} to {backscatter_path}")
-        result = subprocess.run(['cl2nc', input_dat_file, backscatter_path], check=True, capture_output=True, text=True, timeout=300)
+        # stdout is never used; stderr is kept as raw bytes and only decoded on failure
+        result = subprocess.run(['cl2nc', input_dat_file, backscatter_path], check=True,
+                                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=300)
         print(f"[{datetime.now()}] Successfully converted {input_dat_file} to {backscatter_path}")
         
-        # Upload the NetCDF file to S3
-        upload_to_s3(backscatter_path, bucket_name, f'{s3_folder}/{file_name}.nc')
+        # Upload the NetCDF file to S3 in the background; any earlier entry for this path has
+        # finished and is superseded by this newer conversion
+        future = executor.submit(upload_to_s3, backscatter_path, bucket_name, f'{s3_folder}/{file_name}.nc')
+        pending_uploads[backscatter_path] = (future, input_dat_file, dat_time)
         
     except subprocess.CalledProcessError as e:
         print(f"Error during conversion: {e}")
-        print(f"Error output:\n{e.stderr}")
+        print(f"Error output:\n{e.stderr.decode('utf-8', errors='replace') if e.stderr else ''}")
         return
     except subprocess.TimeoutExpired as e:
         print(f"[{datetime.now()}] cl2nc process took too long and timed out: {e}")
         return
-    
-
-    return ()
 
 
 
-# Infinite loop to process files every minute
+# Process .dat files as filesystem events report them written, at most every PROCESS_INTERVAL
+# seconds while they are growing
 if __name__ == "__main__":
     base_folder = '/home/cl31c/CL31/raw'
     output_folder = '/home/cl31c/CL31/pro'
@@ -107,17 +255,32 @@ if __name__ == "__main__":
     longitude = "-119.0206"  # Replace with actual lon
     bucket_name = "in-situ-592as8"
     
-    while True:
-        latest_dat_file = find_latest_dat_file(base_folder)
-
-        if latest_dat_file:
-            print(f"[{datetime.now()}] Processing .dat file: {latest_dat_file}")
-            s3_folder = generate_s3_folder(latitude, longitude)
+    # .dat files already converted and uploaded, keyed by path with the mtime they had at the time
+    processed_state_file = os.path.join(output_folder, 'processed_dat_files.json')
+    processed = load_processed(processed_state_file)
+    
+    handler = DatFileHandler()
+    observer = Observer()
+    observer.schedule(handler, base_folder, recursive=True)
+    observer.start()
+    
+    # Catch up on anything written while this script was not running: every recent .dat file
+    # that has changed since its last recorded upload (this includes the final data of a file
+    # that rotated out while the script was down)
+    horizon = time.time() - PROCESSED_RETENTION
+    for dat_file, dat_time in find_dat_files(base_folder).items():
+        if dat_time >= horizon and processed.get(dat_file) != dat_time:
+            handler.record(dat_file, closed=True)
+    
+    try:
+        while True:
+            # Sleep until the next interval, or until the logger finishes a file
+            handler.file_closed.wait(timeout=PROCESS_INTERVAL)
+            for dat_file in record_uploaded(processed, processed_state_file):
+                handler.record(dat_file)
             
-            df = process_cl2nc_and_separate_data(latest_dat_file, output_folder, bucket_name, s3_folder)
-
-        else:
-            print(f"[{datetime.now()}] No .dat files found.")
-        
-        print(f"[{datetime.now()}] Waiting for 1 minute before checking again.")
-        time.sleep(300)
+            for dat_file in handler.take_changed_files():
+                process_if_changed(dat_file, processed, output_folder, bucket_name, latitude, longitude)
+    finally:
+        observer.stop()
+        observer.join()